@@ -298,15 +298,13 @@ class AudioProcessor:
 
             signed_url = upload_response.json()['signedUrl']
 
-            # Step 2: Upload file to signed URL
+            # Step 2: Upload file to signed URL (streamed from disk, not read into memory)
             with open(file_path, 'rb') as file:
-                file_data = file.read()
-
-            upload_put_response = requests.put(
-                signed_url,
-                data=file_data,
-                headers={'Content-Type': 'application/octet-stream'}
-            )
+                upload_put_response = requests.put(
+                    signed_url,
+                    data=file,
+                    headers={'Content-Type': 'application/octet-stream'}
+                )
             upload_put_response.raise_for_status()
 
             return signed_url
@@ -3,6 +3,7 @@ import os, re, pathlib, requests, sys
 import cloudinary
 from cloudinary.uploader import upload
 from cloudinary.utils import cloudinary_url
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 # Cloudinary configuration - these should be set via environment variables in production
@@ -14,6 +15,12 @@ API_SECRET = os.getenv("CLOUDINARY_API_SECRET", "MSkq8QMFFuFjjzkYPnhcLFr9S74")
 VIDEO_EXTS = {".mp4", ".mov", ".mkv", ".webm", ".m4v"}
 AUDIO_EXTS = {".m4a", ".mp3", ".wav", ".aac", ".flac", ".ogg"}
 
+# Max concurrent Cloudinary uploads per merge
+MAX_UPLOAD_WORKERS = 8
+
+# Characters not allowed in a Cloudinary public_id
+UNSAFE_PUBLIC_ID_RE = re.compile(r"[^a-zA-Z0-9_\-]")
+
 def init_cloudinary():
     """Initialize Cloudinary with the configured credentials."""
     cloudinary.config(
@@ -27,7 +34,7 @@ def as_public_id(path: str) -> str:
     """Convert a file path to a safe Cloudinary public_id."""
     name = pathlib.Path(path).stem
     # safe-ish public_id
-    return re.sub(r"[^a-zA-Z0-9_\-]", "_", name)
+    return UNSAFE_PUBLIC_ID_RE.sub("_", name)
 
 def detect_mode(ext: str) -> str:
     """Detect if the file extension is video or audio."""
@@ -136,13 +143,19 @@ def merge_files(local_files: List[str], output_path: str = None) -> str:
     # 2) Upload all files as "video" resources (Cloudinary handles audio in video pipeline)
     public_ids = []
     for p in local_files:
-        pid = as_public_id(p)
-        # avoid collision if two files share same stem; append index if needed
-        if pid in public_ids:
-            pid = f"{pid}_{len(public_ids)}"
-        upload_as_video_resource(p, pid)
+        base_pid = pid = as_public_id(p)
+        # avoid collision if two files share same stem; bump the suffix until it's unique
+        # (uploads below run concurrently with overwrite=True, so ids must never repeat)
+        n = len(public_ids)
+        while pid in public_ids:
+            pid = f"{base_pid}_{n}"
+            n += 1
         public_ids.append(pid)
 
+    # Uploads are independent network transfers, so run them concurrently
+    with ThreadPoolExecutor(max_workers=min(MAX_UPLOAD_WORKERS, len(local_files))) as ex:
+        list(ex.map(upload_as_video_resource, local_files, public_ids))  # list() re-raises upload errors
+
     # 3) Build the splice URL: base is first clip, then splice each subsequent clip
     base, tail = public_ids[0], public_ids[1:]
     merged_delivery_url = build_splice_url(base, tail, output_format=output_format)
@@ -14,7 +14,6 @@ import os
 import sys
 import glob
 import requests
-from pathlib import Path
 from typing import Optional, Tuple
 from audio_processor import AudioProcessor
 
@@ -94,13 +93,19 @@ class InteractiveAudioProcessor:
         """Override the input file path for the next processing call."""
         self._override_input_path = path
 
-    def find_audio_file(self) -> Optional[Tuple[str, str]]:
+    def find_audio_file(self, input_path: Optional[str] = None) -> Optional[Tuple[str, str]]:
         """
         Find the audio file to process.
         Priority:
-          1. If set_input_file() was called, use that file.
-          2. Otherwise, look for a default sample.m4a in the current directory.
+          1. If input_path is given, use that file only (None if it doesn't exist).
+          2. If set_input_file() was called, use that file.
+          3. Otherwise, look for a default sample.m4a in the current directory.
         """
+        if input_path is not None:
+            if os.path.exists(input_path):
+                return input_path, os.path.basename(input_path)
+            return None
+
         if self._override_input_path and os.path.exists(self._override_input_path):
             return self._override_input_path, os.path.basename(self._override_input_path)
 
@@ -116,7 +121,7 @@ class InteractiveAudioProcessor:
             response = requests.get(url, stream=True)
             response.raise_for_status()
             with open(output_path, 'wb') as file:
-                for chunk in response.iter_content(chunk_size=8192):
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
                     file.write(chunk)
             return True
         except Exception as e:
@@ -135,8 +140,13 @@ class InteractiveAudioProcessor:
             return f"{size_bytes / (1024 * 1024 * 1024):.2f} GB"
 
     # ----------------- Core processing -----------------
-    async def process_audio_file(self, command: str):
-        """Process audio file with the given command."""
+    async def process_audio_file(self, command: str, input_path: Optional[str] = None,
+                                 out_dir: Optional[str] = None):
+        """
+        Process audio file with the given command.
+        input_path is used directly when given, so concurrent calls don't share set_input_file() state.
+        The result is written to out_dir (default: current directory); returns its absolute path (or None).
+        """
         try:
             config = self.function_map.get(command)
             if not config:
@@ -144,7 +154,7 @@ class InteractiveAudioProcessor:
                 return
 
             # Get audio file
-            file_info = self.find_audio_file()
+            file_info = self.find_audio_file(input_path)
             if not file_info:
                 print('❌ No audio file found')
                 return
@@ -163,9 +173,11 @@ class InteractiveAudioProcessor:
 
             # Download
             download_url = result['result']['download_url']
-            input_ext = Path(filename).suffix.lower()
-            output_ext = input_ext
-            output_path = f"{Path(filename).stem}-{command.replace(' ', '-')}{output_ext}"
+            stem, input_ext = os.path.splitext(filename)
+            output_ext = input_ext.lower()
+            # Absolute path, so callers can use it directly instead of probing candidate locations
+            output_name = f"{stem}-{command.replace(' ', '-')}{output_ext}"
+            output_path = os.path.abspath(os.path.join(out_dir or os.getcwd(), output_name))
 
             if self.download_file(download_url, output_path):
                 size = os.path.getsize(output_path)
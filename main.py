@@ -2,11 +2,12 @@
 import os
 import re
 import asyncio
-import copy
+import threading
+import time
 from typing import Optional, List, Tuple
-from datetime import datetime
 
-from flask import Flask, request, jsonify, send_file
+import orjson
+from flask import Flask, request, send_file
 from flask_cors import CORS
 
 try:
@@ -40,73 +41,78 @@ mongo_db = None
 # Initialize MongoDB client
 if MONGODB_AVAILABLE:
     try:
-        mongo_client = MongoClient(MONGODB_URI)
+        # One client per process; its pool is shared by all request threads
+        mongo_client = MongoClient(
+            MONGODB_URI,
+            maxPoolSize=50,
+            minPoolSize=5,
+            maxIdleTimeMS=60000,
+            serverSelectionTimeoutMS=3000,
+            connectTimeoutMS=3000,
+            socketTimeoutMS=5000,
+            compressors="zlib",
+            connect=False,  # connect on first use instead of blocking worker boot
+        )
         mongo_db = mongo_client[DB_NAME]
-        # Test connection
-        mongo_client.admin.command('ping')
-        print("✅ MongoDB connection successful")
+        print("✅ MongoDB client configured")
     except Exception as e:
-        print(f"❌ MongoDB connection failed: {e}")
+        print(f"❌ MongoDB client setup failed: {e}")
         MONGODB_AVAILABLE = False
         mongo_client = None
         mongo_db = None
 
 
-def serialize_mongo_doc(doc):
-    """Convert MongoDB document to JSON-serializable format WITHOUT modifying the original."""
-    if doc is None:
-        return None
+def ensure_indexes():
+    """Create the indexes backing the per-user queries (no-op if they already exist)."""
+    if not MONGODB_AVAILABLE or mongo_db is None:
+        return
 
-    # Create a deep copy to avoid modifying the original document
-    doc_copy = copy.deepcopy(doc)
+    try:
+        # find({"username": ...}).sort("updatedAt", -1).limit(n) -> index scan, no in-memory sort
+        mongo_db.chats.create_index([("username", 1), ("updatedAt", DESCENDING)])
+        mongo_db.library_items.create_index([("username", 1), ("updatedAt", DESCENDING)])
+        # Login lookup
+        mongo_db.users.create_index([("username", 1)])
+        print("✅ MongoDB indexes ensured")
+    except Exception as e:
+        print(f"❌ MongoDB index creation failed: {e}")
 
-    # Convert ObjectId to string
-    if '_id' in doc_copy:
-        doc_copy['_id'] = str(doc_copy['_id'])
 
-    # Convert datetime objects to ISO format strings
-    for key, value in doc_copy.items():
-        if isinstance(value, datetime):
-            doc_copy[key] = value.isoformat()
-        elif isinstance(value, list):
-            # Handle nested documents in arrays (like messages in chats)
-            for item in value:
-                if isinstance(item, dict):
-                    for nested_key, nested_value in item.items():
-                        if isinstance(nested_value, datetime):
-                            item[nested_key] = nested_value.isoformat()
+# Runs off the import path so worker boot doesn't wait on a database round-trip
+threading.Thread(target=ensure_indexes, name="ensure-indexes", daemon=True).start()
 
-    return doc_copy
 
+# Fields the frontend uses from chat documents; ?fields= may narrow this further
+CHAT_FIELDS = ("title", "messages", "createdAt", "updatedAt")
+CHAT_PROJECTION = {field: 1 for field in CHAT_FIELDS}
 
-def get_user_by_credentials(username: str, password: str):
-    """Authenticate user by username and password - using the same approach as your working script."""
-    if not MONGODB_AVAILABLE or not mongo_db:
-        print("MongoDB not available for authentication")
-        return None
+_FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
 
-    try:
-        print(f"Searching for user: {username}")
-        user = mongo_db.users.find_one({
-            "username": username,
-            "password": password
-        })
 
-        if user:
-            print(f"User found: {user.get('username')}")
-            return serialize_mongo_doc(user)
-        else:
-            print(f"User not found or wrong password")
-            return None
+def build_projection(fields: Optional[str], allowed: Optional[Tuple[str, ...]] = None):
+    """Turn a comma-separated ?fields= value into a find() projection.
 
-    except Exception as e:
-        print(f"Error authenticating user {username}: {e}")
+    Only names in `allowed` are kept (any plain top-level field name if `allowed` is None).
+    Returns None when nothing usable was requested.
+    """
+    if not fields:
         return None
 
+    projection = {}
+    for name in fields.split(","):
+        name = name.strip()
+        if not _FIELD_NAME_RE.match(name):
+            continue
+        if allowed is not None and name not in allowed:
+            continue
+        projection[name] = 1
 
-def get_user_chats(username: str, limit: int = 50):
+    return projection or None
+
+
+def get_user_chats(username: str, limit: int = 50, fields: Optional[str] = None):
     """Fetch chats for a given username - using the EXACT same approach as your working script."""
-    if not MONGODB_AVAILABLE or not mongo_db:
+    if not MONGODB_AVAILABLE or mongo_db is None:
         print("MongoDB not available for chats")
         return []
 
@@ -116,31 +122,25 @@ def get_user_chats(username: str, limit: int = 50):
         # Use the EXACT same query as your working script
         chats = list(
             mongo_db.chats
-            .find({"username": username})
+            .find({"username": username}, build_projection(fields, CHAT_FIELDS) or CHAT_PROJECTION)
             .sort("updatedAt", DESCENDING)  # Use DESCENDING constant like your working script
             .limit(limit)
+            .batch_size(abs(limit))  # whole result in the first reply, no getMore (negative limit = single batch)
         )
 
         print(f"Found {len(chats)} chats for {username}")
 
-        # Serialize each chat
-        serialized_chats = []
-        for chat in chats:
-            serialized_chat = serialize_mongo_doc(chat)
-            serialized_chats.append(serialized_chat)
-
-        return serialized_chats
+        # Documents are returned as-is; ojsonify encodes ObjectId/datetime in one pass
+        return chats
 
     except Exception as e:
         print(f"Error fetching chats for {username}: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+        raise  # let the route report a server error rather than an empty list
 
 
-def get_user_library_items(username: str, limit: int = 100):
+def get_user_library_items(username: str, limit: int = 100, fields: Optional[str] = None):
     """Fetch library items for a given username - using the same approach."""
-    if not MONGODB_AVAILABLE or not mongo_db:
+    if not MONGODB_AVAILABLE or mongo_db is None:
         print("MongoDB not available for library")
         return []
 
@@ -149,56 +149,164 @@ def get_user_library_items(username: str, limit: int = 100):
 
         library_items = list(
             mongo_db.library_items
-            .find({"username": username})
+            .find({"username": username}, build_projection(fields))
             .sort("updatedAt", DESCENDING)
             .limit(limit)
+            .batch_size(abs(limit))
         )
 
         print(f"Found {len(library_items)} library items for {username}")
 
-        # Serialize each item
-        serialized_items = []
-        for item in library_items:
-            serialized_item = serialize_mongo_doc(item)
-            serialized_items.append(serialized_item)
-
-        return serialized_items
+        return library_items
 
     except Exception as e:
         print(f"Error fetching library items for {username}: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+        raise
+
+
+def get_user_login_data(username: str, password: str, chats_limit: int = 50, library_limit: int = 100):
+    """Authenticate a user and fetch their chats and library items in a single aggregation.
+
+    Returns the user document (without password) with `chats` and `library_items` arrays,
+    or None if the credentials don't match. Database errors are raised to the caller.
+    """
+    if not MONGODB_AVAILABLE or mongo_db is None:
+        print("MongoDB not available for authentication")
+        return None
+
+    try:
+        print(f"Searching for user: {username}")
+        pipeline = [
+            {"$match": {"username": username, "password": password}},
+            {"$limit": 1},
+            {"$lookup": {
+                "from": "chats",
+                "localField": "username",
+                "foreignField": "username",
+                "pipeline": [
+                    {"$sort": {"updatedAt": DESCENDING}},
+                    {"$limit": chats_limit},
+                    {"$project": CHAT_PROJECTION},
+                ],
+                "as": "chats",
+            }},
+            {"$lookup": {
+                "from": "library_items",
+                "localField": "username",
+                "foreignField": "username",
+                "pipeline": [
+                    {"$sort": {"updatedAt": DESCENDING}},
+                    {"$limit": library_limit},
+                ],
+                "as": "library_items",
+            }},
+            # Password never leaves the database
+            {"$project": {"username": 1, "email": 1, "createdAt": 1, "chats": 1, "library_items": 1}},
+        ]
+        user = next(mongo_db.users.aggregate(pipeline), None)
+
+        if user:
+            print(f"User found: {user.get('username')} "
+                  f"({len(user['chats'])} chats, {len(user['library_items'])} library items)")
+        else:
+            print(f"User not found or wrong password")
+        return user
+
+    except Exception as e:
+        print(f"Error authenticating user {username}: {e}")
+        raise  # a database failure must not look like invalid credentials
+
+
+def _orjson_default(obj):
+    """Fallback encoder for types orjson does not handle natively (e.g. ObjectId)."""
+    if MONGODB_AVAILABLE and isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def ojson_dumps(obj) -> bytes:
+    """Encode `obj` to JSON bytes with orjson (datetimes keep the naive isoformat() form)."""
+    return orjson.dumps(obj, default=_orjson_default)
+
+
+def ojsonify(obj, status: int = 200):
+    """Build a JSON response with orjson instead of Flask's pure-Python encoder."""
+    return app.response_class(ojson_dumps(obj), status=status, mimetype="application/json")
 
 
 # Flask app setup
 app = Flask(__name__)
 app.config["MAX_CONTENT_LENGTH"] = 32 * 1024 * 1024
-CORS(app)
+# Comma-separated list of allowed origins, e.g. "https://app.example.com,http://localhost:3000"
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()]
+CORS(app, origins=CORS_ORIGINS)
 
 CLEANVOICE_KEY = os.getenv("CLEANVOICE_API_KEY", "FJB8s8nbmY9UQcfeXFeB6tqJmjwDUkKN")
-iap = InteractiveAudioProcessor(CLEANVOICE_KEY)
 
 # Cohere setup
 COHERE_KEY = os.getenv("CO_API_KEY") or os.getenv("COHERE_API_KEY")
-co = cohere.Client(COHERE_KEY) if COHERE_KEY and COHERE_AVAILABLE else None
+
+# Heavy clients are built on first use rather than at import (every worker pays import cost)
+_iap = None
+_co = None
+_clients_lock = threading.Lock()
+
+
+def get_iap() -> InteractiveAudioProcessor:
+    """Return the shared InteractiveAudioProcessor, creating it on first use."""
+    global _iap
+    if _iap is None:
+        with _clients_lock:
+            if _iap is None:
+                _iap = InteractiveAudioProcessor(CLEANVOICE_KEY)
+    return _iap
+
+
+def get_co():
+    """Return the shared Cohere client, or None if Cohere is not configured."""
+    global _co
+    if _co is None and COHERE_KEY and COHERE_AVAILABLE:
+        with _clients_lock:
+            if _co is None:
+                _co = cohere.Client(COHERE_KEY)
+    return _co
 
 
 @app.route("/", methods=["GET"])
 def root():
-    return jsonify({"ok": True, "service": "VibeVideo Flask API"}), 200
+    return ojsonify({"ok": True, "service": "VibeVideo Flask API"}, 200)
 
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"ok": True, "mongodb": MONGODB_AVAILABLE})
+    """Liveness probe; also reports whether MongoDB currently answers a ping."""
+    mongodb_ok = False
+    if MONGODB_AVAILABLE and mongo_client is not None:
+        try:
+            mongo_client.admin.command('ping')
+            mongodb_ok = True
+        except Exception as e:
+            print(f"MongoDB health check failed: {e}")
+
+    return ojsonify({"ok": True, "mongodb": mongodb_ok})
+
+
+# /debug/mongo hits the database several times; serve a recent result instead
+DEBUG_MONGO_TTL = 5  # seconds
+_debug_mongo_cache = (0.0, None)  # (monotonic timestamp, encoded JSON body)
 
 
 @app.route("/debug/mongo", methods=["GET"])
 def debug_mongo():
     """Debug endpoint to test MongoDB connection and data."""
-    if not MONGODB_AVAILABLE or not mongo_db:
-        return jsonify({"error": "MongoDB not available"}), 500
+    global _debug_mongo_cache
+
+    if not MONGODB_AVAILABLE or mongo_db is None:
+        return ojsonify({"error": "MongoDB not available"}, 500)
+
+    cached_at, body = _debug_mongo_cache
+    if body is not None and time.monotonic() - cached_at < DEBUG_MONGO_TTL:
+        return app.response_class(body, mimetype="application/json")
 
     try:
         # Test basic connection
@@ -213,19 +321,22 @@ def debug_mongo():
         sample_user = mongo_db.users.find_one()
         sample_chat = mongo_db.chats.find_one()
 
-        return jsonify({
+        body = ojson_dumps({
             "connection": "OK",
             "counts": {
                 "users": user_count,
                 "chats": chat_count,
                 "library_items": library_count
             },
-            "sample_user": serialize_mongo_doc(sample_user) if sample_user else None,
-            "sample_chat": serialize_mongo_doc(sample_chat) if sample_chat else None
+            "sample_user": sample_user,
+            "sample_chat": sample_chat
         })
+        _debug_mongo_cache = (time.monotonic(), body)
+
+        return app.response_class(body, mimetype="application/json")
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return ojsonify({"error": str(e)}, 500)
 
 
 @app.route("/login", methods=["POST"])
@@ -233,14 +344,14 @@ def login():
     """Authenticate user against MongoDB database."""
     print("=== LOGIN ATTEMPT ===")
 
-    if not MONGODB_AVAILABLE or not mongo_db:
-        return jsonify({"error": "Database connection not available"}), 500
+    if not MONGODB_AVAILABLE or mongo_db is None:
+        return ojsonify({"error": "Database connection not available"}, 500)
 
     try:
         # Get JSON data from request
         data = request.get_json()
         if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
+            return ojsonify({"error": "No JSON data provided"}, 400)
 
         username = data.get("username", "").strip()
         password = data.get("password", "").strip()
@@ -248,17 +359,16 @@ def login():
         print(f"Login attempt for username: {username}")
 
         if not username or not password:
-            return jsonify({"error": "Username and password are required"}), 400
+            return ojsonify({"error": "Username and password are required"}, 400)
 
-        # Authenticate user
-        user = get_user_by_credentials(username, password)
+        # Authenticate user and fetch their chats/library items in one round-trip
+        user = get_user_login_data(username, password)
 
         if not user:
-            return jsonify({"error": "Invalid credentials"}), 401
+            return ojsonify({"error": "Invalid credentials"}, 401)
 
         print(f"Login successful for: {username}")
 
-        # Remove password from response for security
         user_response = {
             "_id": user.get("_id"),
             "username": user.get("username"),
@@ -266,22 +376,18 @@ def login():
             "createdAt": user.get("createdAt")
         }
 
-        # Fetch user's chats and library items
-        chats = get_user_chats(username)
-        library_items = get_user_library_items(username)
-
-        return jsonify({
+        return ojsonify({
             "message": "Login successful",
             "user": user_response,
-            "chats": chats,
-            "library_items": library_items
-        }), 200
+            "chats": user["chats"],
+            "library_items": user["library_items"]
+        }, 200)
 
     except Exception as e:
         print(f"Login error: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 
 @app.route("/chats", methods=["GET"])
@@ -289,18 +395,18 @@ def get_chats():
     """Get chats for a specific user."""
     print("=== GET CHATS REQUEST ===")
 
-    if not MONGODB_AVAILABLE or not mongo_db:
-        return jsonify({"error": "Database connection not available"}), 500
+    if not MONGODB_AVAILABLE or mongo_db is None:
+        return ojsonify({"error": "Database connection not available"}, 500)
 
     username = request.args.get("username")
     print(f"Requested chats for username: {username}")
 
     if not username:
-        return jsonify({"error": "Username parameter is required"}), 400
+        return ojsonify({"error": "Username parameter is required"}, 400)
 
     try:
         limit = int(request.args.get("limit", 50))
-        chats = get_user_chats(username, limit)
+        chats = get_user_chats(username, limit, request.args.get("fields"))
 
         response = {
             "username": username,
@@ -309,15 +415,15 @@ def get_chats():
         }
 
         print(f"Returning {len(chats)} chats")
-        return jsonify(response), 200
+        return ojsonify(response, 200)
 
     except ValueError:
-        return jsonify({"error": "Invalid limit parameter"}), 400
+        return ojsonify({"error": "Invalid limit parameter"}, 400)
     except Exception as e:
         print(f"Get chats error: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 
 @app.route("/library", methods=["GET"])
@@ -325,18 +431,18 @@ def get_library():
     """Get library items for a specific user."""
     print("=== GET LIBRARY REQUEST ===")
 
-    if not MONGODB_AVAILABLE or not mongo_db:
-        return jsonify({"error": "Database connection not available"}), 500
+    if not MONGODB_AVAILABLE or mongo_db is None:
+        return ojsonify({"error": "Database connection not available"}, 500)
 
     username = request.args.get("username")
     print(f"Requested library for username: {username}")
 
     if not username:
-        return jsonify({"error": "Username parameter is required"}), 400
+        return ojsonify({"error": "Username parameter is required"}, 400)
 
     try:
         limit = int(request.args.get("limit", 100))
-        library_items = get_user_library_items(username, limit)
+        library_items = get_user_library_items(username, limit, request.args.get("fields"))
 
         response = {
             "username": username,
@@ -345,15 +451,15 @@ def get_library():
         }
 
         print(f"Returning {len(library_items)} library items")
-        return jsonify(response), 200
+        return ojsonify(response, 200)
 
     except ValueError:
-        return jsonify({"error": "Invalid limit parameter"}), 400
+        return ojsonify({"error": "Invalid limit parameter"}, 400)
     except Exception as e:
         print(f"Get library error: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 
 if __name__ == "__main__":